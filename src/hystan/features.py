@@ -1,6 +1,39 @@
 import numpy as np
 import pandas as pd
-from hystan.preprocess import merge_dataframes, interpolate_and_fill
+from hystan.preprocess import interpolate_and_fill
+
+# compute_all_features で y 値の乖離・比率・勾配を計算する割合のデフォルト値
+DEFAULT_FRACTIONS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def _pseudo_area(y_upper: np.ndarray, y_lower: np.ndarray) -> float:
+    """compute_pseudo_area_random_sampling の計算本体（配列を受け取る）。"""
+    # Y 軸の最小値を取得（シフト後の配列は作らず、和から差し引く）
+    y_min = min(np.nanmin(y_upper), np.nanmin(y_lower))
+
+    # データ数の少ない側を基準にデータをランダムサンプリングで揃える
+    # (DataFrame.sample(random_state=42) と同じ乱数列で同じ行を選択する)
+    N_upper = len(y_upper)
+    N_lower = len(y_lower)
+    N_min = min(N_upper, N_lower)
+
+    rng = np.random.RandomState(42)
+    if N_upper > N_lower:
+        y_upper = y_upper[rng.choice(N_upper, N_min, replace=False)]
+    elif N_lower > N_upper:
+        y_lower = y_lower[rng.choice(N_lower, N_min, replace=False)]
+
+    # Y値を足し合わせる（擬似的な面積を取得）
+    # (NaN は pandas の sum と同様に除外し、float32 の入力でも float64 で積算する)
+    y_min = float(y_min)
+    sum_upper = np.nansum(y_upper, dtype=np.float64)
+    sum_lower = np.nansum(y_lower, dtype=np.float64)
+    sum_upper -= np.count_nonzero(~np.isnan(y_upper)) * y_min
+    sum_lower -= np.count_nonzero(~np.isnan(y_lower)) * y_min
+
+    # 面積の差分を計算（擬似的な面積差）
+    pseudo_area = np.abs(sum_upper - sum_lower)
+    return pseudo_area
 
 
 def compute_pseudo_area_random_sampling(df_upper, df_lower, y_column) -> float:
@@ -11,42 +44,34 @@ def compute_pseudo_area_random_sampling(df_upper, df_lower, y_column) -> float:
     Parameters:
         df_upper (DataFrame): 上のグラフのデータ (x_column, y_column を含む)。
         df_lower (DataFrame): 下のグラフのデータ (x_column, y_column を含む)。
-        x_column (str): X 軸のカラム名（例: "H_kOe"）。
+        y_column (str): Y 軸のカラム名（例: "Rh(Ω)"）。
 
     Returns:
         float: 2つのグラフの間の面積（擬似的な積算値から求めた面積）。
     """
+    return _pseudo_area(df_upper[y_column].to_numpy(), df_lower[y_column].to_numpy())
 
-    # Y 軸の最小値を取得して正規化
-    y_min = min(df_upper[y_column].min(), df_lower[y_column].min())
-    df_upper_norm = df_upper.copy()
-    df_lower_norm = df_lower.copy()
-    df_upper_norm[y_column] -= y_min
-    df_lower_norm[y_column] -= y_min
 
-    # データ数の少ない側を基準にデータをランダムサンプリングで揃える
-    N_upper = len(df_upper_norm)
-    N_lower = len(df_lower_norm)
-    N_min = min(N_upper, N_lower)
+def _change_rate_stats(values: np.ndarray) -> tuple[float, float]:
+    """compute_change_rate_stats の計算本体（配列を受け取る）。"""
+    values = values.astype(float, copy=False)
 
-    if N_upper > N_lower:
-        df_upper_sampled = df_upper_norm.sample(
-            N_min, random_state=42
-        )  # 上側をランダムサンプリング
-        df_lower_sampled = df_lower_norm
-    else:
-        df_upper_sampled = df_upper_norm
-        df_lower_sampled = df_lower_norm.sample(
-            N_min, random_state=42
-        )  # 下側をランダムサンプリング
+    # pandas の pct_change と同様に、NaN は直前の有効な値で埋めてから計算する
+    nan_mask = np.isnan(values)
+    if nan_mask.any():
+        last_valid = np.where(nan_mask, 0, np.arange(len(values)))
+        values = values[np.maximum.accumulate(last_valid)]
 
-    # Y値を足し合わせる（擬似的な面積を取得）
-    sum_upper = np.sum(df_upper_sampled[y_column])
-    sum_lower = np.sum(df_lower_sampled[y_column])
+    # 変化率を計算（前の値との差分の割合）。入力の DataFrame は変更しない
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_rate = values[1:] / values[:-1] - 1.0
 
-    # 面積の差分を計算（擬似的な面積差）
-    pseudo_area = np.abs(sum_upper - sum_lower)
-    return pseudo_area
+    # 変化率の統計量を計算（NaN は pandas の mean/var と同様に除外）
+    valid = change_rate[~np.isnan(change_rate)]
+    mean_change_rate = float(valid.mean()) if valid.size > 0 else np.nan
+    var_change_rate = float(valid.var(ddof=1)) if valid.size > 1 else np.nan
+
+    return mean_change_rate, var_change_rate
 
 
 def compute_change_rate_stats(
@@ -60,16 +85,16 @@ def compute_change_rate_stats(
         column_name (str): 変化率を計算するカラム名。
 
     Returns:
-        dict: 変化率の平均と分散を含む辞書。
+        tuple[float, float]: 変化率の平均と分散。
     """
-    # 変化率を計算（前の値との差分の割合）
-    df["change_rate"] = df[column_name].pct_change()
+    return _change_rate_stats(df[column_name].to_numpy())
 
-    # 変化率の統計量を計算
-    mean_change_rate = df["change_rate"].mean()
-    var_change_rate = df["change_rate"].var()
 
-    return mean_change_rate, var_change_rate
+def _zero_crossings(y: np.ndarray) -> int:
+    """1つのデータ列のゼロ交差回数を計算する関数（配列を受け取る）。"""
+    # 隣り合う点で符号が変わった箇所を数える（diff/where の中間配列を作らない）
+    sign = np.sign(y)
+    return int(np.count_nonzero(sign[1:] != sign[:-1]))
 
 
 def compute_zero_crossings(df1: pd.DataFrame, df2: pd.DataFrame, y_column: str) -> int:
@@ -84,14 +109,21 @@ def compute_zero_crossings(df1: pd.DataFrame, df2: pd.DataFrame, y_column: str)
     Returns:
         int: df1 と df2 のゼロ交差回数の合計。
     """
+    zero_df1 = _zero_crossings(df1[y_column].to_numpy())
+    zero_df2 = _zero_crossings(df2[y_column].to_numpy())
+    return zero_df1 + zero_df2
 
-    def compute(df):
-        zero_crossings = np.where(np.diff(np.sign(df[y_column])))[0]
-        return len(zero_crossings)
 
-    zero_df1 = compute(df1)
-    zero_df2 = compute(df2)
-    return zero_df1 + zero_df2
+def _value_range(y1: np.ndarray, y2: np.ndarray) -> float:
+    """compute_range の計算本体（配列を受け取る）。"""
+    # 統合・ソートはせず、それぞれの最大値・最小値から範囲を求める（空のデータは除外）
+    # (pandas の max/min と同様に NaN は除外し、有効な値が無い場合は NaN を返す)
+    arrays = [y for y in (y1, y2) if np.count_nonzero(~np.isnan(y)) > 0]
+    if not arrays:
+        return np.nan
+    y_max = np.nanmax([np.nanmax(y) for y in arrays])
+    y_min = np.nanmin([np.nanmin(y) for y in arrays])
+    return float(y_max - y_min)
 
 
 def compute_range(df1, df2, y_column) -> float:
@@ -106,8 +138,44 @@ def compute_range(df1, df2, y_column) -> float:
     Returns:
         float: 統合データの最大値 - 最小値の範囲。
     """
-    df = merge_dataframes(df1, df2)
-    return df[y_column].max() - df[y_column].min()
+    return _value_range(df1[y_column].to_numpy(), df2[y_column].to_numpy())
+
+
+def _fraction_index(fractions, length: int) -> np.ndarray:
+    """
+    割合（0: 先頭, 1: 末尾）を、長さ length のデータで最も近いインデックスに変換する。
+    int(round(fraction * (length - 1))) を複数の割合に対してまとめて計算する。
+    """
+    fractions = np.asarray(fractions, dtype=float)
+    return np.rint(fractions * (length - 1)).astype(np.intp)
+
+
+def _gradient_at(x: np.ndarray, y: np.ndarray, fractions) -> np.ndarray:
+    """get_gradient_at_fraction の計算本体（配列と複数の割合を受け取る）。"""
+    # NaN を除外した y の値がすべて同じ場合、勾配は常に 0
+    y_valid = y[~np.isnan(y)]
+    if y_valid.size > 0 and np.ptp(y_valid) == 0:
+        return np.zeros(np.shape(fractions))
+
+    # インデックスとその前後の点を取得（端では片側の点）
+    index = _fraction_index(fractions, len(y))
+    prev = np.maximum(index - 1, 0)
+    next_ = np.minimum(index + 1, len(y) - 1)
+
+    # np.gradient(y, x) と同じ式で、指定インデックスの勾配だけを計算する
+    # 内部は2次精度の中央差分、端は片側差分
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dx1 = x[index] - x[prev]
+        dx2 = x[next_] - x[index]
+        central = (
+            -dx2 / (dx1 * (dx1 + dx2)) * y[prev]
+            + (dx2 - dx1) / (dx1 * dx2) * y[index]
+            + dx1 / (dx2 * (dx1 + dx2)) * y[next_]
+        )
+        one_sided = (y[next_] - y[prev]) / (x[next_] - x[prev])
+
+    interior = (index > 0) & (index < len(y) - 1)
+    return np.where(interior, central, one_sided)
 
 
 def get_gradient_at_fraction(df, fraction, x_col="H_kOe", y_col="Rh") -> float:
@@ -125,22 +193,46 @@ def get_gradient_at_fraction(df, fraction, x_col="H_kOe", y_col="Rh") -> float:
     Returns:
         float: 指定した割合での勾配。
     """
-    # NaN を除外した y の値がすべて同じ場合、勾配は常に 0
-    if df[y_col].dropna().nunique() == 1:
-        return 0.0
+    return float(
+        _gradient_at(df[x_col].to_numpy(), df[y_col].to_numpy(), [fraction])[0]
+    )
+
+
+def get_gradient_at_fraction_batch(
+    df, fractions, x_col="H_kOe", y_col="Rh"
+) -> np.ndarray:
+    """
+    get_gradient_at_fraction を複数の割合に対してまとめて計算する関数。
+
+    Parameters:
+        df (DataFrame): 入力データフレーム。
+        fractions (array-like): 取得したい位置の割合の配列（0: 先頭, 1: 末尾）。
+        x_col (str): x 軸のカラム名（デフォルト: "H_kOe"）。
+        y_col (str): y 軸のカラム名（デフォルト: "Rh(Ω)"）。
+
+    Returns:
+        np.ndarray: fractions と同じ順番で並んだ勾配の配列。
+    """
+    return _gradient_at(df[x_col].to_numpy(), df[y_col].to_numpy(), fractions)
 
-    # インデックスの範囲を取得
-    index = int(round(fraction * (len(df) - 1)))
 
-    # x, y 値のリストを取得
-    x = df[x_col].to_numpy()
-    y = df[y_col].to_numpy()
+def _filled_y(df1, df2, x_col, y_col) -> tuple[np.ndarray, np.ndarray]:
+    """
+    interpolate_and_fill で補完した df1, df2 の y 値を配列で返す関数。
+    """
+    # interpolate_and_fill は入力を書き換えないため、コピーは不要
+    df1_filled, df2_filled = interpolate_and_fill(df1, df2, x_col, y_col)
+    return df1_filled[y_col].to_numpy(), df2_filled[y_col].to_numpy()
+
 
-    # 中央差分を用いた勾配計算
-    dy_dx = np.gradient(y, x)
+def _y_deviation_at(y1: np.ndarray, y2: np.ndarray, fractions) -> np.ndarray:
+    """compute_y_deviation の計算本体（補完済みの配列と複数の割合を受け取る）。"""
+    # インデックスの取得（データフレームの縦幅に基づく位置）
+    index_df1 = _fraction_index(fractions, len(y1))
+    index_df2 = _fraction_index(fractions, len(y2))
 
-    # 指定インデックスの勾配を返す
-    return float(dy_dx[index])
+    # y 値の乖離を計算（絶対差）
+    return np.abs(y1[index_df1] - y2[index_df2])
 
 
 def compute_y_deviation(df1, df2, x_col="H_kOe", y_col="Rh(Ω)", fraction=0.5):
@@ -160,43 +252,127 @@ def compute_y_deviation(df1, df2, x_col="H_kOe", y_col="Rh(Ω)", fraction=0.5):
     """
 
     # df1, df2 の補完を実行（元データを上書きしない）
-    df1_filled, df2_filled = interpolate_and_fill(df1.copy(), df2.copy(), x_col, y_col)
+    y1, y2 = _filled_y(df1, df2, x_col, y_col)
 
-    # インデックスの取得（データフレームの縦幅に基づく位置）
-    index_df1 = int(round(fraction * (len(df1_filled) - 1)))
-    index_df2 = int(round(fraction * (len(df2_filled) - 1)))
+    return float(_y_deviation_at(y1, y2, [fraction])[0])
 
-    # 対応する y 値を取得
-    y_df1 = df1_filled.iloc[index_df1][y_col]
-    y_df2 = df2_filled.iloc[index_df2][y_col]
 
-    # y 値の乖離を計算（絶対差）
-    deviation = abs(y_df1 - y_df2)
+def compute_y_deviation_batch(
+    df1, df2, fractions, x_col="H_kOe", y_col="Rh(Ω)"
+) -> np.ndarray:
+    """
+    compute_y_deviation を複数の割合に対してまとめて計算する関数。
+    補完は1回だけ実行し、全ての割合で共有する。
 
-    return float(deviation)
+    Parameters:
+        df1 (pd.DataFrame): 1つ目の DataFrame（補完前）。
+        df2 (pd.DataFrame): 2つ目の DataFrame（補完前）。
+        fractions (array-like): 計算する x 軸の割合の配列（0.0 から 1.0）。
+        x_col (str): x 軸のカラム名（デフォルト: "H_kOe"）。
+        y_col (str): y 軸のカラム名（デフォルト: "Rh(Ω)"）。
+
+    Returns:
+        np.ndarray: fractions と同じ順番で並んだ y 値の乖離（絶対値）の配列。
+    """
+    y1, y2 = _filled_y(df1, df2, x_col, y_col)
 
+    return _y_deviation_at(y1, y2, fractions)
 
-def compute_y_ratio(df1, df2, x_col="H_kOe", y_col="Rh(Ω)", fraction=0.5):
-    df1_filled, df2_filled = interpolate_and_fill(df1.copy(), df2.copy(), x_col, y_col)
 
+def _y_ratio_at(y1: np.ndarray, y2: np.ndarray, fractions) -> np.ndarray:
+    """compute_y_ratio の計算本体（補完済みの配列と複数の割合を受け取る）。"""
     # y 軸の最小値を 0 にシフト
-    y_min = min(df1_filled[y_col].min(), df2_filled[y_col].min())
-    df1_filled[y_col] -= y_min
-    df2_filled[y_col] -= y_min
+    y_min = min(np.nanmin(y1), np.nanmin(y2))
 
     # インデックスの取得
-    index_df1 = int(round(fraction * (len(df1_filled) - 1)))
-    index_df2 = int(round(fraction * (len(df2_filled) - 1)))
+    index_df1 = _fraction_index(fractions, len(y1))
+    index_df2 = _fraction_index(fractions, len(y2))
 
     # y 値の取得
-    y_df1 = df1_filled.iloc[index_df1][y_col]
-    y_df2 = df2_filled.iloc[index_df2][y_col]
+    y_df1 = y1[index_df1] - y_min
+    y_df2 = y2[index_df2] - y_min
 
-    # ゼロや極小値による inf を防ぐ
+    # ゼロや極小値による inf を防ぐ（0 なら小さい値に置き換える）
     epsilon = 1e-10
-    if abs(y_df2) < epsilon:
-        y_df2 = epsilon  # 0 なら小さい値に置き換える
+    y_df2 = np.where(np.abs(y_df2) < epsilon, epsilon, y_df2)
+
+    return y_df1 / y_df2
 
-    ratio = y_df1 / y_df2
 
-    return float(ratio)
+def compute_y_ratio(df1, df2, x_col="H_kOe", y_col="Rh(Ω)", fraction=0.5):
+    y1, y2 = _filled_y(df1, df2, x_col, y_col)
+
+    return float(_y_ratio_at(y1, y2, [fraction])[0])
+
+
+def compute_y_ratio_batch(
+    df1, df2, fractions, x_col="H_kOe", y_col="Rh(Ω)"
+) -> np.ndarray:
+    """
+    compute_y_ratio を複数の割合に対してまとめて計算する関数。
+    補完は1回だけ実行し、全ての割合で共有する。
+
+    Parameters:
+        df1 (pd.DataFrame): 1つ目の DataFrame（補完前）。
+        df2 (pd.DataFrame): 2つ目の DataFrame（補完前）。
+        fractions (array-like): 計算する x 軸の割合の配列（0.0 から 1.0）。
+        x_col (str): x 軸のカラム名（デフォルト: "H_kOe"）。
+        y_col (str): y 軸のカラム名（デフォルト: "Rh(Ω)"）。
+
+    Returns:
+        np.ndarray: fractions と同じ順番で並んだ y 値の比率の配列。
+    """
+    y1, y2 = _filled_y(df1, df2, x_col, y_col)
+
+    return _y_ratio_at(y1, y2, fractions)
+
+
+def compute_all_features(
+    df1, df2, fractions=DEFAULT_FRACTIONS, x_col="H_kOe", y_col="Rh(Ω)"
+) -> dict[str, float]:
+    """
+    折り返し前後の DataFrame から、このモジュールの特徴量をまとめて計算する関数。
+    各カラムは一度だけ配列として取り出し、補間も1回だけ実行して全ての特徴量で共有する。
+
+    Parameters:
+        df1 (DataFrame): 折り返し前のデータ。
+        df2 (DataFrame): 折り返し後のデータ。
+        fractions (Sequence[float]): y 値の乖離・比率・勾配を計算する割合（0.0 から 1.0）。
+        x_col (str): x 軸のカラム名（デフォルト: "H_kOe"）。
+        y_col (str): y 軸のカラム名（デフォルト: "Rh(Ω)"）。
+
+    Returns:
+        dict[str, float]: 特徴量名と値の辞書。割合ごとの特徴量は
+            "y_deviation_0.5" のように割合を付けた名前になる。
+    """
+    x1 = df1[x_col].to_numpy()
+    x2 = df2[x_col].to_numpy()
+    y1 = df1[y_col].to_numpy()
+    y2 = df2[y_col].to_numpy()
+
+    mean_df1, var_df1 = _change_rate_stats(y1)
+    mean_df2, var_df2 = _change_rate_stats(y2)
+
+    features = {
+        "zero_crossings": _zero_crossings(y1) + _zero_crossings(y2),
+        "range": _value_range(y1, y2),
+        "pseudo_area": float(_pseudo_area(y1, y2)),
+        "change_rate_mean_df1": mean_df1,
+        "change_rate_var_df1": var_df1,
+        "change_rate_mean_df2": mean_df2,
+        "change_rate_var_df2": var_df2,
+    }
+
+    # 割合ごとの特徴量（補間結果は共有し、全ての割合をまとめて計算する）
+    y1_filled, y2_filled = _filled_y(df1, df2, x_col, y_col)
+    per_fraction = {
+        "y_deviation": _y_deviation_at(y1_filled, y2_filled, fractions),
+        "y_ratio": _y_ratio_at(y1_filled, y2_filled, fractions),
+        "gradient_df1": _gradient_at(x1, y1, fractions),
+        "gradient_df2": _gradient_at(x2, y2, fractions),
+    }
+    for i, fraction in enumerate(fractions):
+        for name, values in per_fraction.items():
+            features[f"{name}_{fraction:g}"] = float(values[i])
+
+    return features
@@ -1,46 +1,50 @@
+import numpy as np
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
-import io
-from typing import Tuple, List
-import matplotlib.image as mpimg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Optional, Union
 import base64
 import os
-from PIL import Image
+import threading
+from PIL import Image, ImageDraw
 from io import BytesIO
+from urllib.parse import quote
 
 
-def plot_chart(
+# render_chart で使い回す Figure（スレッドごとに figsize 別に保持する）
+_CHART_FIGURES = threading.local()
+
+
+def plot_chart_into(
+    ax1: plt.Axes,
+    ax2: plt.Axes,
     data_df: pd.DataFrame,
     x_column: str = "H(kOe)",
     y_column1: str = "Rh(Ω)",
     y_column2: str = "dRh/dH(mΩ/Oe)",
-    figsize: Tuple[int, int] = (8, 8),
     title: str = None,
-) -> plt.Figure:
+) -> None:
     """
-    実験データを基に H(kOe) に対する Rh(Ω) と dRh/dH(mΩ/Oe) のグラフを作成し、Figureオブジェクトを返す。
-
-    グラフは以下の構成で描画される：
-    - X軸: 磁場 H(kOe)
-    - 左Y軸: 抵抗 Rh(Ω)（スチールブルーでプロット）
-    - 右Y軸: 抵抗の微分 dRh/dH(mΩ/Oe)（ダークオレンジでプロット）
+    既存の Axes をクリアし、plot_chart と同じグラフを描画する。
 
     Args:
+        ax1 (plt.Axes): 左Y軸（Rh(Ω)）を描画する Axes。
+        ax2 (plt.Axes): 右Y軸（dRh/dH(mΩ/Oe)）を描画する Axes（ax1.twinx() で作成したもの）。
         data_df (pd.DataFrame): グラフ作成の元となるデータフレーム。
         x_column (str, optional): X軸のデータ列名（デフォルトは "H(kOe)"）。
         y_column1 (str, optional): 左Y軸のデータ列名（デフォルトは "Rh(Ω)"）。
         y_column2 (str, optional): 右Y軸のデータ列名（デフォルトは "dRh/dH(mΩ/Oe)"）。
-        figsize (Tuple[int, int], optional): グラフのサイズ (幅, 高さ)（デフォルトは (8, 8)）。
         title (str, optional): グラフのタイトル（デフォルトは None）。
-
-    Returns:
-        plt.Figure: 作成したグラフの Figure オブジェクト。
     """
     rh_color = "#4682B4"  # スチールブルー
     drh_color = "#FF8C00"  # ダークオレンジ
 
-    # グラフを描画
-    fig, ax1 = plt.subplots(figsize=figsize)  # 正方形の画像サイズ
+    # 前回の描画内容を消去
+    ax1.cla()
+    ax2.cla()
 
     # 左側のY軸: Rh(Ω)
     ax1.plot(data_df[x_column], data_df[y_column1], color=rh_color, linewidth=1)
@@ -50,9 +54,10 @@ def plot_chart(
     ax1.tick_params(axis="x", labelsize=16)
     ax1.grid(visible=True, which="major", linestyle="--", linewidth=0.5)
 
-    # 右側のY軸: dRh/dH列
-    ax2 = ax1.twinx()
+    # 右側のY軸: dRh/dH列（cla() でラベルと指数表記の位置が左に戻るため右側に設定し直す）
     ax2.plot(data_df[x_column], data_df[y_column2], color=drh_color, linewidth=1)
+    ax2.yaxis.set_label_position("right")
+    ax2.yaxis.set_offset_position("right")
     ax2.set_ylabel(y_column2, color=drh_color, fontsize=16)
     ax2.tick_params(axis="y", labelcolor=drh_color, labelsize=16)
 
@@ -60,13 +65,100 @@ def plot_chart(
     if title:
         ax1.set_title(title, fontsize=22, pad=20)  # タイトルを追加
 
+
+def plot_chart(
+    data_df: pd.DataFrame,
+    x_column: str = "H(kOe)",
+    y_column1: str = "Rh(Ω)",
+    y_column2: str = "dRh/dH(mΩ/Oe)",
+    figsize: Tuple[int, int] = (8, 8),
+    title: str = None,
+) -> plt.Figure:
+    """
+    実験データを基に H(kOe) に対する Rh(Ω) と dRh/dH(mΩ/Oe) のグラフを作成し、Figureオブジェクトを返す。
+
+    グラフは以下の構成で描画される：
+    - X軸: 磁場 H(kOe)
+    - 左Y軸: 抵抗 Rh(Ω)（スチールブルーでプロット）
+    - 右Y軸: 抵抗の微分 dRh/dH(mΩ/Oe)（ダークオレンジでプロット）
+
+    Args:
+        data_df (pd.DataFrame): グラフ作成の元となるデータフレーム。
+        x_column (str, optional): X軸のデータ列名（デフォルトは "H(kOe)"）。
+        y_column1 (str, optional): 左Y軸のデータ列名（デフォルトは "Rh(Ω)"）。
+        y_column2 (str, optional): 右Y軸のデータ列名（デフォルトは "dRh/dH(mΩ/Oe)"）。
+        figsize (Tuple[int, int], optional): グラフのサイズ (幅, 高さ)（デフォルトは (8, 8)）。
+        title (str, optional): グラフのタイトル（デフォルトは None）。
+
+    Returns:
+        plt.Figure: 作成したグラフの Figure オブジェクト。
+    """
+    # グラフを描画
+    fig, ax1 = plt.subplots(figsize=figsize)  # 正方形の画像サイズ
+    ax2 = ax1.twinx()
+    plot_chart_into(ax1, ax2, data_df, x_column, y_column1, y_column2, title)
+
     # レイアウト調整
-    plt.tight_layout()
+    fig.tight_layout()
 
     # Figureオブジェクトを返す
     return fig
 
 
+def render_chart(
+    data_df: pd.DataFrame,
+    x_column: str = "H(kOe)",
+    y_column1: str = "Rh(Ω)",
+    y_column2: str = "dRh/dH(mΩ/Oe)",
+    figsize: Tuple[int, int] = (8, 8),
+    title: str = None,
+) -> np.ndarray:
+    """
+    plot_chart と同じグラフを描画し、RGBA のピクセル配列として返す。
+
+    Figure を毎回作成せず、スレッドごとに保持した Figure を使い回すため、
+    大量のグラフを作成する場合は plot_chart より高速。pyplot を経由しないため、
+    作成した Figure が pyplot に登録されることもない。
+    戻り値は combine_figures にそのまま渡すことができる。
+
+    Args:
+        data_df (pd.DataFrame): グラフ作成の元となるデータフレーム。
+        x_column (str, optional): X軸のデータ列名（デフォルトは "H(kOe)"）。
+        y_column1 (str, optional): 左Y軸のデータ列名（デフォルトは "Rh(Ω)"）。
+        y_column2 (str, optional): 右Y軸のデータ列名（デフォルトは "dRh/dH(mΩ/Oe)"）。
+        figsize (Tuple[int, int], optional): グラフのサイズ (幅, 高さ)（デフォルトは (8, 8)）。
+        title (str, optional): グラフのタイトル（デフォルトは None）。
+
+    Returns:
+        np.ndarray: 描画したグラフの画像 (高さ, 幅, 4) の uint8 配列。
+    """
+    if not hasattr(_CHART_FIGURES, "figures"):
+        _CHART_FIGURES.figures = {}
+    figures = _CHART_FIGURES.figures
+    figsize = tuple(figsize)
+    if figsize not in figures:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        ax1 = fig.add_subplot()
+        figures[figsize] = (fig, ax1, ax1.twinx())
+    fig, ax1, ax2 = figures[figsize]
+
+    plot_chart_into(ax1, ax2, data_df, x_column, y_column1, y_column2, title)
+
+    # 前回のレイアウトに依存しないよう、余白を初期値に戻してから調整する
+    fig.subplots_adjust(
+        **{
+            key: matplotlib.rcParams[f"figure.subplot.{key}"]
+            for key in ("left", "bottom", "right", "top")
+        }
+    )
+    fig.tight_layout()
+    fig.canvas.draw()
+
+    # 次の描画で上書きされるため、コピーして返す
+    return np.array(fig.canvas.buffer_rgba())
+
+
 def create_empty_figure(figsize=(8, 8)) -> plt.Figure:
     """
     Create an empty Figure object.
@@ -80,8 +172,54 @@ def create_empty_figure(figsize=(8, 8)) -> plt.Figure:
     return fig
 
 
+def _crop_figure_to_tight_bbox(fig: plt.Figure) -> np.ndarray:
+    """
+    Figure を描画し、savefig(bbox_inches="tight") と同じ範囲を切り出した RGBA のピクセル配列を返す。
+    """
+    # plt.close 済みの Figure は Agg のキャンバスを持たないため、その場合は割り当てる
+    canvas = fig.canvas
+    if not isinstance(canvas, FigureCanvasAgg):
+        canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    rgba = np.asarray(canvas.buffer_rgba())
+
+    # 余白を除いた範囲（インチ単位、原点は左下）をピクセル単位に変換して切り出す
+    bbox = fig.get_tightbbox(canvas.get_renderer()).padded(
+        matplotlib.rcParams["savefig.pad_inches"]
+    )
+    height, width = rgba.shape[:2]
+    left = max(int(round(bbox.x0 * fig.dpi)), 0)
+    right = min(int(round(bbox.x1 * fig.dpi)), width)
+    top = max(height - int(round(bbox.y1 * fig.dpi)), 0)
+    bottom = min(height - int(round(bbox.y0 * fig.dpi)), height)
+    return rgba[top:bottom, left:right]
+
+
+def _crop_array_to_content(rgba: np.ndarray) -> np.ndarray:
+    """
+    RGBA のピクセル配列から背景色（左上の画素の色）以外が描画されている範囲を、
+    savefig(bbox_inches="tight") と同じ余白を残して切り出す。
+    """
+    content = np.any(rgba != rgba[0, 0], axis=-1)
+    if not content.any():
+        return rgba
+
+    rows = np.flatnonzero(content.any(axis=1))
+    cols = np.flatnonzero(content.any(axis=0))
+    pad = int(
+        round(
+            matplotlib.rcParams["savefig.pad_inches"]
+            * matplotlib.rcParams["figure.dpi"]
+        )
+    )
+    return rgba[
+        max(rows[0] - pad, 0) : rows[-1] + 1 + pad,
+        max(cols[0] - pad, 0) : cols[-1] + 1 + pad,
+    ]
+
+
 def combine_figures(
-    fig_list: List[plt.Figure],
+    fig_list: List[Union[plt.Figure, np.ndarray]],
     nrows: int = 3,
     ncols: int = 3,
     figsize: Tuple[int, int] = (12, 12),
@@ -91,7 +229,8 @@ def combine_figures(
     外側の軸線は残しつつ目盛りだけを非表示にする。
 
     Args:
-        fig_list (List[Figure]): 結合したいMatplotlib Figureのリスト
+        fig_list (List[Union[Figure, np.ndarray]]): 結合したいMatplotlib Figureのリスト
+            （render_chart が返す RGBA のピクセル配列も指定できる）
         nrows (int, optional): 行数. Defaults to 3.
         ncols (int, optional): 列数. Defaults to 3.
         figsize (Tuple[int, int], optional): 作成するFigureのサイズ. Defaults to (12, 12).
@@ -109,42 +248,83 @@ def combine_figures(
             f"but got {len(fig_list)}."
         )
 
-    # 新しいFigureを作成（nrows×ncolsのサブプロット）
-    combined_fig, axes = plt.subplots(nrows, ncols, figsize=figsize)
-
-    # axesが1次元配列になる場合や2次元になる場合に備えてフラット化
-    if nrows == 1 and ncols == 1:
-        axes = [[axes]]  # 両方1なら軸は1つ
-    elif nrows == 1 or ncols == 1:
-        axes = [axes] if nrows == 1 else [[ax] for ax in axes]
+    # 元のFigureを描画し、RGBAのピクセル配列を取得（PNGへの変換・再読み込みはしない）
+    # savefig(bbox_inches="tight") と同様に、周囲の余白は切り落とす
+    images = []
+    for fig in fig_list:
+        if isinstance(fig, np.ndarray):
+            images.append(Image.fromarray(_crop_array_to_content(fig)))
+        else:
+            images.append(Image.fromarray(_crop_figure_to_tight_bbox(fig)))
+
+    # 1枚の画像に nrows×ncols のグリッド状に貼り付ける
+    cell_width = max(img.width for img in images)
+    cell_height = max(img.height for img in images)
+
+    # plt.tight_layout の既定の余白（フォントサイズの 1.08 倍）に相当する間隔を、
+    # まとめた Figure 上での大きさに換算して画像の間と周囲に空ける
+    pixels_per_inch = max(
+        ncols * cell_width / figsize[0], nrows * cell_height / figsize[1]
+    )
+    gap = int(round(1.08 * matplotlib.rcParams["font.size"] / 72 * pixels_per_inch))
+
+    combined_img = Image.new(
+        "RGB",
+        (ncols * (cell_width + gap) + gap, nrows * (cell_height + gap) + gap),
+        "white",
+    )
+    draw = ImageDraw.Draw(combined_img)
+
+    for i, img in enumerate(images):
+        row = i // ncols
+        col = i % ncols
+        # 各画像は縦横比を保ったままセルに収まるよう拡大し、セルの中央に配置する
+        scale = min(cell_width / img.width, cell_height / img.height)
+        if scale != 1:
+            img = img.resize((round(img.width * scale), round(img.height * scale)))
+        left = gap + col * (cell_width + gap) + (cell_width - img.width) // 2
+        top = gap + row * (cell_height + gap) + (cell_height - img.height) // 2
+        combined_img.paste(img, (left, top), img)
+
+        # 外側の軸線を残す（各画像の枠線を描画）
+        draw.rectangle(
+            (left, top, left + img.width - 1, top + img.height - 1), outline="black"
+        )
 
-    # サブプロットそれぞれに元のFigureを画像として配置
-    for i, fig in enumerate(fig_list):
-        # 元のFigureをメモリ上にPNG形式で保存
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png", bbox_inches="tight")
-        buf.seek(0)
+    # まとめた画像を1つのFigureに表示
+    combined_fig = plt.figure(figsize=figsize)
+    ax = combined_fig.add_axes((0, 0, 1, 1))
+    ax.imshow(combined_img)
+    ax.axis("off")
 
-        # 保存した画像を読み込み
-        img = mpimg.imread(buf)
+    return combined_fig
 
-        # サブプロットに画像を表示
-        row = i // ncols
-        col = i % ncols
-        axes[row][col].imshow(img)
 
-        # 外側の軸線を残して目盛りだけ消す
-        axes[row][col].set_xticks([])
-        axes[row][col].set_yticks([])
+def _encode_image_to_webp(img_path: str, max_size: int) -> Optional[bytes]:
+    """
+    画像を縮小して WebP 形式にエンコードしたバイト列を返す。
+    画像を読み込めない場合はエラーを表示して None を返す。
+    """
+    try:
+        # 画像を開いて縮小処理（メモリ節約）
+        with Image.open(img_path) as img:
+            img.thumbnail((max_size, max_size))  # 指定サイズ以下に縮小
 
-    # レイアウトを整える
-    plt.tight_layout()
+            buffer = BytesIO()
+            img.save(buffer, format="WEBP", quality=80)  # WebPで軽量化
+            return buffer.getvalue()
 
-    return combined_fig
+    except Exception as e:
+        print(f"エラー（{os.path.basename(img_path)}）: {e}")
+        return None
 
 
 def generate_html_from_images(
-    input_dir: str, output_html: str, columns: int = 3, max_size: int = 800
+    input_dir: str,
+    output_html: str,
+    columns: int = 3,
+    max_size: int = 800,
+    embed_images: bool = True,
 ) -> None:
     """
     指定したフォルダ内の画像をHTMLに埋め込み、グリッド状に表示し、クリックでアスペクト比を維持したまま拡大可能にする。
@@ -154,6 +334,9 @@ def generate_html_from_images(
         output_html (str): 生成するHTMLファイルのパス。
         columns (int, optional): 1行あたりの画像数（デフォルト: 3）。
         max_size (int, optional): 画像の最大サイズ（デフォルト: 800px）。
+        embed_images (bool, optional): True の場合は画像を Base64 で HTML に埋め込み、
+            1つのファイルで完結させる。False の場合は画像を HTML と同じ場所の
+            "<HTMLファイル名>_images" フォルダに WebP で保存し、参照する（デフォルト: True）。
 
     Returns:
         None: HTMLファイルを作成するが、戻り値はなし。
@@ -162,6 +345,12 @@ def generate_html_from_images(
     # 画像リストを取得（ソートして並び順を統一）
     image_list: List[str] = sorted(os.listdir(input_dir))
 
+    # 画像をファイルとして保存する場合の保存先
+    if not embed_images:
+        images_dir_name = f"{os.path.splitext(os.path.basename(output_html))[0]}_images"
+        images_dir = os.path.join(os.path.dirname(output_html), images_dir_name)
+        os.makedirs(images_dir, exist_ok=True)
+
     # HTMLをストリーム書き込み（メモリ節約）
     with open(output_html, "w", encoding="utf-8") as f:
         f.write(f"""
@@ -224,37 +413,49 @@ def generate_html_from_images(
             <div class="grid-container">
         """)
 
-        for idx, img_file in enumerate(image_list):
-            img_path: str = os.path.join(input_dir, img_file)
-
-            try:
-                # 画像を開いて縮小処理（メモリ節約）
-                with Image.open(img_path) as img:
-                    img.thumbnail((max_size, max_size))  # 指定サイズ以下に縮小
-
-                    # Base64エンコード（メモリに保持しない）
-                    buffer = BytesIO()
-                    img.save(buffer, format="WEBP", quality=80)  # WebPで軽量化
-                    encoded_string: str = base64.b64encode(buffer.getvalue()).decode(
-                        "utf-8"
-                    )
-
-                    # HTMLにBase64データを書き込む（クリックで拡大）
-                    f.write(f"""
+        # 画像の縮小・エンコードはスレッドで並列に実行し、結果は元の順番で書き込む
+        # (PIL はデコード・エンコード中に GIL を解放する)
+        img_paths = [os.path.join(input_dir, img_file) for img_file in image_list]
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            webp_images = executor.map(
+                lambda img_path: _encode_image_to_webp(img_path, max_size), img_paths
+            )
+
+            for idx, webp_image in enumerate(webp_images):
+                if webp_image is None:
+                    continue
+
+                if embed_images:
+                    # Base64データはサムネイルにのみ書き込み、拡大表示では同じデータを参照する
+                    encoded_string = base64.b64encode(webp_image).decode("utf-8")
+                    thumb_src = f"data:image/webp;base64,{encoded_string}"
+                    modal_src = f'data-thumb="thumb{idx}"'
+                else:
+                    # 画像ファイルとして保存し、サムネイルと拡大表示の両方から参照する
+                    with open(os.path.join(images_dir, f"{idx}.webp"), "wb") as img_f:
+                        img_f.write(webp_image)
+                    thumb_src = f"{quote(images_dir_name)}/{idx}.webp"
+                    modal_src = f'src="{thumb_src}"'
+
+                # HTMLに画像を書き込む（クリックで拡大）
+                f.write(f"""
                     <a href="#img{idx}">
-                        <img src="data:image/webp;base64,{encoded_string}" id="thumb{idx}">
+                        <img src="{thumb_src}" id="thumb{idx}">
                     </a>
                     <div id="img{idx}" class="modal">
                         <a href="#" class="close">&times;</a>
-                        <img src="data:image/webp;base64,{encoded_string}">
+                        <img {modal_src}>
                     </div>
                     """)
 
-            except Exception as e:
-                print(f"エラー（{img_file}）: {e}")
-
         f.write("""
             </div>
+            <script>
+                // 拡大表示用の画像にサムネイルと同じデータを設定する
+                document.querySelectorAll(".modal img[data-thumb]").forEach(function (img) {
+                    img.src = document.getElementById(img.dataset.thumb).src;
+                });
+            </script>
         </body>
         </html>
         """)
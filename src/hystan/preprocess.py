@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -14,16 +15,24 @@ def split_dataframe_at_turning_point(
         df1 (DataFrame): 折り返し前のデータ (H(kOe) の降順でソート)
         df2 (DataFrame): 折り返し後のデータ (H(kOe) の昇順でソート)
     """
-    # H(kOe) の最小値のインデックスを取得（折り返し点）
-    turning_index = df[target_col].idxmin()
+    # H(kOe) の最小値の位置を取得（折り返し点）
+    turning_index = int(np.nanargmin(df[target_col].to_numpy()))
 
-    # 折り返し前後でデータを分割
-    df1 = df.iloc[: turning_index + 1].copy()  # 折り返し前 (Hが減少する部分)
-    df2 = df.iloc[turning_index + 1 :].copy()  # 折り返し後 (Hが増加する部分)
+    def sort_by_target(df_part):
+        """
+        target_col の昇順に並べる。測定データは通常単調に変化するため、
+        単調な場合はソートせずにそのまま、または逆順にするだけで済ませる。
+        """
+        diff = np.diff(df_part[target_col].to_numpy())
+        if (diff >= 0).all():
+            return df_part.reset_index(drop=True)
+        if (diff <= 0).all():
+            return df_part.iloc[::-1].reset_index(drop=True)
+        return df_part.sort_values(by=target_col, ascending=True).reset_index(drop=True)
 
-    # H(kOe) でソート
-    df1 = df1.sort_values(by=target_col, ascending=True).reset_index(drop=True)
-    df2 = df2.sort_values(by=target_col, ascending=True).reset_index(drop=True)
+    # 折り返し前後でデータを分割し、H(kOe) でソート（コピーは reset_index で作成される）
+    df1 = sort_by_target(df.iloc[: turning_index + 1])  # 折り返し前 (Hが減少する部分)
+    df2 = sort_by_target(df.iloc[turning_index + 1 :])  # 折り返し後 (Hが増加する部分)
 
     return df1, df2
 
@@ -42,9 +51,25 @@ def apply_moving_average(df, column_name, window_size=10) -> pd.DataFrame:
     """
     df = df.copy()  # 元のデータを変更しないようにコピー
     new_column_name = f"{column_name}_MA"
-    df[new_column_name] = (
-        df[column_name].rolling(window=window_size, center=True).mean()
-    )
+
+    # 中央揃えの移動平均（rolling(center=True).mean() と同じ配置）
+    # ウィンドウが埋まらない両端は NaN にする
+    # 各ウィンドウの合計を直接計算するため、外れ値や inf の影響はそのウィンドウ内に留まる
+    values = df[column_name].to_numpy(dtype=float)
+    moving_average = np.full(len(values), np.nan)
+    if len(values) >= window_size:
+        start = window_size // 2
+        window_means = (
+            np.convolve(values, np.ones(window_size), mode="valid") / window_size
+        )
+        # rolling().mean() と同様に、inf を含むウィンドウは NaN にする
+        is_inf = np.isinf(values)
+        if is_inf.any():
+            inf_counts = np.convolve(is_inf, np.ones(window_size, dtype=int), "valid")
+            window_means[inf_counts > 0] = np.nan
+        moving_average[start : start + len(window_means)] = window_means
+
+    df[new_column_name] = moving_average
     return df
 
 
@@ -78,35 +103,39 @@ def interpolate_and_fill(df1, df2, x_col="H_kOe", y_col="Rh(Ω)"):
         y_col (str): y 軸のカラム名（デフォルト: "Rh(Ω)"）。
 
     Returns:
-        tuple[pd.DataFrame, pd.DataFrame]: 補完された df1 と df2。
+        tuple[pd.DataFrame, pd.DataFrame]: 補完された df1 と df2（x_col, y_col のカラムのみ）。
     """
-    # x 軸の補完のため、共通の x 値を作成
-    common_x_values = pd.Series(sorted(set(df1[x_col]).union(set(df2[x_col]))))
+    # x 軸の補完のため、共通の x 値を作成（ソート済み・重複なし）
+    common_x_values = np.union1d(df1[x_col].to_numpy(), df2[x_col].to_numpy())
+    positions = np.arange(len(common_x_values))
 
-    def interpolate_and_fill_df(df):
+    def interpolate_and_fill_y(df):
         """
-        指定した DataFrame を x 軸で補完し、y 軸の NaN を前後の値で補完する。
+        指定した DataFrame の y 値を共通の x 軸上に配置し、NaN を最も近い点の値で補完する。
         """
-        # x 軸の補完
-        df_interp = (
-            df.set_index(x_col)
-            .reindex(common_x_values)
-            .reset_index()
-            .rename(columns={"index": x_col})
-        )
+        # x 軸の補完（共通の x 軸上の位置に y 値を配置）
+        y = np.full(len(common_x_values), np.nan)
+        y[np.searchsorted(common_x_values, df[x_col].to_numpy())] = df[y_col]
 
-        # y 軸の補間（線形補間）
-        df_interp[y_col] = df_interp[y_col].interpolate(
-            method="nearest", limit_direction="both"
-        )
+        known = np.flatnonzero(~np.isnan(y))
+        if known.size == 0:
+            return y
 
-        # y 軸の NaN を前後の値で埋める（前方埋め + 後方埋め）
-        df_interp[y_col] = df_interp[y_col].ffill().bfill()
+        # y 軸の補間（行位置が最も近い値、等距離なら前側を採用）
+        # 両端の NaN は端の値で埋まる（前方埋め + 後方埋めと同じ）
+        right = np.searchsorted(known, positions).clip(max=known.size - 1)
+        left = (right - 1).clip(min=0)
+        use_left = positions - known[left] <= known[right] - positions
+        nearest = np.where(use_left, known[left], known[right])
 
-        return df_interp
+        return y[nearest]
 
     # df1, df2 の補完を実行
-    df1_filled = interpolate_and_fill_df(df1)
-    df2_filled = interpolate_and_fill_df(df2)
+    df1_filled = pd.DataFrame(
+        {x_col: common_x_values, y_col: interpolate_and_fill_y(df1)}
+    )
+    df2_filled = pd.DataFrame(
+        {x_col: common_x_values, y_col: interpolate_and_fill_y(df2)}
+    )
 
     return df1_filled, df2_filled
@@ -1,9 +1,19 @@
+import re
+import io
 import pandas as pd
 import matplotlib.pyplot as plt
-import io
-from typing import Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 from hystan.image import plot_chart
 
+# A2行の各項目を取り出す正規表現（項目の並び順には依存しない）
+# 値は空白までの文字列を取り出し、int() / float() で変換する
+_A2_Y_PATTERN = re.compile(r"Y=([^ ]*)")
+_A2_X_PATTERN = re.compile(r"X=([^ ]*)")
+_A2_FRONT_PATTERN = re.compile(r"R\[Front\]:([^ ]*)")
+_A2_REAR_PATTERN = re.compile(r"R\[Rear\]:\s*([^ ]*)")
+
 
 def process_a2_value(a2_text: str) -> Optional[Dict[str, float]]:
     """csvのメタデータ行(A2)からCAD, Y, X, R[Front], R[Rear]の値を抽出する関数.
@@ -14,34 +24,48 @@ def process_a2_value(a2_text: str) -> Optional[Dict[str, float]]:
     Returns:
         Optional[Dict[str, float]]: A2の情報（CAD, Y, X, R[Front], R[Rear]）
     """
+    matches = [
+        pattern.search(a2_text)
+        for pattern in (
+            _A2_Y_PATTERN,
+            _A2_X_PATTERN,
+            _A2_FRONT_PATTERN,
+            _A2_REAR_PATTERN,
+        )
+    ]
+    if any(match is None for match in matches):
+        print(f"A2行の値から各項目が抽出できません: {a2_text}")
+        return None
+    y_text, x_text, front_text, rear_text = (match.group(1) for match in matches)
+
     try:
-        # CAD, Y, X, R[Front], R[Rear]を抽出
-        cad_part = a2_text.split(" ")[0]
-        y_value = int(a2_text.split("Y=")[1].split(" ")[0])  # Y=10
-        x_value = int(a2_text.split("X=")[1].split(" ")[0])  # X=10
-        front_value = float(
-            a2_text.split("R[Front]:")[1].split(" ")[0].replace("kΩ", "")
-        )  # R[Front]
-        rear_value = float(a2_text.split("R[Rear]:")[1].replace("kΩ", ""))  # R[Rear]
-
-        return {
-            "CAD": cad_part.replace("CAD", ""),
-            "Y": y_value,
-            "X": x_value,
-            "R[Front]": front_value,
-            "R[Rear]": rear_value,
-        }
-    except Exception as e:
+        y_value = int(y_text)  # Y=10
+        x_value = int(x_text)  # X=10
+        front_value = float(front_text.replace("kΩ", ""))  # R[Front]
+        rear_value = float(rear_text.replace("kΩ", ""))  # R[Rear]
+    except ValueError as e:
         print(f"A2行の値から各項目が抽出できません: {e}")
         return None
 
+    return {
+        "CAD": a2_text.split(" ")[0].replace("CAD", ""),
+        "Y": y_value,
+        "X": x_value,
+        "R[Front]": front_value,
+        "R[Rear]": rear_value,
+    }
 
-def process_csv(file_path: str) -> Optional[Tuple[Dict[str, float], pd.DataFrame]]:
+
+def process_csv(
+    file_path: str, use_float32: bool = False
+) -> Optional[Tuple[Dict[str, float], pd.DataFrame]]:
     """
     CSVファイルを処理し、メタデータ（A2情報）とデータフレームを取得する関数
 
     Args:
         file_path (str): CSVファイルのパス
+        use_float32 (bool): True の場合、浮動小数点数のカラムを float32 に変換して
+            メモリ使用量を半分にする（有効桁数は約7桁になる）
 
     Returns:
         Optional[Tuple[Dict[str, float], pd.DataFrame]]:
@@ -49,18 +73,20 @@ def process_csv(file_path: str) -> Optional[Tuple[Dict[str, float], pd.DataFrame
             - データフレーム
     """
     with open(file_path, "r", encoding="cp932") as file:
-        lines = file.readlines()
+        # メタデータ取得（2行目）
+        file.readline()
+        meta_data_line = file.readline().strip()
 
-    # メタデータ取得（2行目）
-    meta_data_line = lines[1].strip()
-    a2_values = process_a2_value(meta_data_line)
+        # 実データ取得（9行目以降）。ファイル全体を文字列に展開せず、そのまま読み込む
+        for _ in range(6):
+            file.readline()
+        data_df = pd.read_csv(file)
 
-    # 実データ取得（9行目以降）
-    data_text = "\n".join(lines[8:])
-    data_df = pd.read_csv(io.StringIO(data_text), encoding="shift_jis")
+    a2_values = process_a2_value(meta_data_line)
 
     # `-∞` や `∞` を含む全カラムのデータを数値に変換し、変換できない値は NaN にする
-    data_df = data_df.map(lambda x: pd.to_numeric(x, errors="coerce"))
+    # （セル単位ではなくカラム単位で変換する）
+    data_df = data_df.apply(pd.to_numeric, errors="coerce")
 
     # NaN を含む行を全て削除
     data_df = data_df.dropna()
@@ -74,6 +100,12 @@ def process_csv(file_path: str) -> Optional[Tuple[Dict[str, float], pd.DataFrame
     # [*Clip]という文字列がカラム内にあれば削除
     data_df.columns = data_df.columns.str.replace(r"\[.*\]", "", regex=True)
 
+    # 32bit の型に変換（H(kOe) の計算後に変換し、変換による誤差を増やさない）
+    if use_float32:
+        # 整数カラムは桁あふれを避けるため変換しない
+        dtypes = {col: "float32" for col in data_df.select_dtypes("float64").columns}
+        data_df = data_df.astype(dtypes)
+
     return a2_values, data_df
 
 
@@ -100,3 +132,66 @@ def process_csv_and_visualize(
     fig = plot_chart(data_df, title=title)
 
     return a2_values, fig
+
+
+def process_csv_batch(
+    file_paths: List[str],
+    max_workers: Optional[int] = None,
+    use_float32: bool = False,
+) -> List[Optional[Tuple[Dict[str, float], pd.DataFrame]]]:
+    """
+    複数のCSVファイルを複数プロセスで並列に処理する関数
+
+    Args:
+        file_paths (List[str]): CSVファイルのパスのリスト
+        max_workers (Optional[int]): 使用するプロセス数（None の場合は CPU 数）
+        use_float32 (bool): process_csv の use_float32 と同じ
+
+    Returns:
+        List[Optional[Tuple[Dict[str, float], pd.DataFrame]]]:
+            file_paths と同じ順番で並んだ process_csv の結果
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(partial(process_csv, use_float32=use_float32), file_paths)
+        )
+
+
+def _process_csv_and_render(
+    file_path: str,
+) -> Optional[Tuple[Dict[str, float], bytes]]:
+    """
+    process_csv_and_visualize の結果の Figure を PNG のバイト列に変換する関数（ワーカープロセス用）
+
+    Figure はプロセス間で受け渡すと大きくなるため、ワーカー内で PNG にして閉じる。
+    """
+    result = process_csv_and_visualize(file_path)
+    if result is None:
+        return None
+
+    a2_values, fig = result
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+
+    return a2_values, buf.getvalue()
+
+
+def process_csv_and_visualize_batch(
+    file_paths: List[str], max_workers: Optional[int] = None
+) -> List[Optional[Tuple[Dict[str, float], bytes]]]:
+    """
+    複数のCSVファイルを複数プロセスで並列に処理し、グラフを可視化する関数
+
+    Args:
+        file_paths (List[str]): CSVファイルのパスのリスト
+        max_workers (Optional[int]): 使用するプロセス数（None の場合は CPU 数）
+
+    Returns:
+        List[Optional[Tuple[Dict[str, float], bytes]]]:
+            file_paths と同じ順番で並んだ以下の組
+            - A2の情報（CAD, Y, X, R[Front], R[Rear]）
+            - グラフを PNG 形式で保存したバイト列
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_process_csv_and_render, file_paths))